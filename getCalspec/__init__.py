@@ -1,2 +1,4 @@
 from .getCalspec import *
 from .rebuild import *
+from .export import *
+from .batch import *
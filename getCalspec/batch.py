@@ -0,0 +1,250 @@
+import logging
+import os
+import sys
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+from astropy import units as u
+
+from getCalspec.getCalspec import Calspec, getCalspecCatalog, _loadSpectrumFile, _combineVersions, _loadTable
+
+__all__ = [
+    "get_catalog_versions",
+    "map_spectra",
+]
+
+# description of a numpy array or Quantity sent back by a worker in a block
+# of shared memory
+_SharedArray = namedtuple("_SharedArray", ["name", "shape", "dtype", "unit"])
+
+# result of a worker for a star without the requested spectrum
+_Skipped = namedtuple("_Skipped", ["message"])
+
+
+def _getStars(stars=None):
+    """Make the list of Calspec objects from Calspec objects or star names,
+    all Calspec stars if stars is None."""
+    if stars is None:
+        return list(getCalspecCatalog())
+    return [star if isinstance(star, Calspec) else Calspec(star) for star in stars]
+
+
+def get_catalog_versions(stars=None, type="stis", max_workers=8):
+    """Get all the versions of the spectra of many stars, as in
+    Calspec.get_all_versions(). The files of all stars are downloaded and
+    read concurrently by a single pool of threads, and the versions of each
+    star are combined as soon as its files are read.
+
+    Parameters
+    ----------
+    stars: list, optional
+        The Calspec objects or star names (default: None, all Calspec
+        stars).
+    type: str
+        Choose between STIS or model spectrum. Must be either 'stis'
+        or 'mod' (default: 'stis').
+    max_workers: int
+        Number of files downloaded and read at once (default: 8).
+
+    Returns
+    -------
+    versions: dict
+        The output of Calspec.get_all_versions() for each star, keyed by
+        star name. Stars without any version of the given type, or with a
+        file which cannot be downloaded, are skipped.
+
+    Examples
+    --------
+    >>> versions = get_catalog_versions(stars=["eta1 dor", "mu col"])
+    >>> list(versions.keys())
+    ['eta1dor', 'mucol']
+    """
+    logger = logging.getLogger()
+    versions = {}
+    pending = deque()
+    npending = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for star in _getStars(stars):
+            try:
+                rows = star.get_version_dataframe(type=type)
+            except ValueError as e:
+                logger.warning(f"Skipping {star.Name}: {e}")
+                continue
+            futures = [
+                executor.submit(_loadSpectrumFile, filename, star.Name) for filename in rows["Filename"]
+            ]
+            pending.append((star.Name, rows, futures))
+            npending += len(futures)
+            # the raw spectra of a star are dropped once its versions are
+            # combined
+            while npending > 2 * max_workers:
+                npending -= _combineStarVersions(pending.popleft(), versions, logger)
+        while pending:
+            _combineStarVersions(pending.popleft(), versions, logger)
+    return versions
+
+
+def _combineStarVersions(item, versions, logger):
+    """Combine the versions of a star from get_catalog_versions() when all
+    its files are read, and return the number of files."""
+    name, rows, futures = item
+    try:
+        spectra = [future.result() for future in futures]
+    except RuntimeError as e:
+        logger.warning(f"Skipping {name}: {e}")
+    else:
+        filenames = list(rows["Filename"])
+        versions[name] = _combineVersions(filenames, rows["Date"].to_numpy(), spectra)
+    return len(futures)
+
+
+def _initWorker():
+    """Load the tables and the catalog once in each worker process."""
+    getCalspecCatalog()
+    _loadTable("history")
+
+
+def _toSharedMemory(result):
+    """Move the numpy arrays and Quantities of a result, alone or as values
+    of a dict, to shared memory blocks, which are released by the parent
+    process in _fromSharedMemory()."""
+    if isinstance(result, dict):
+        return {key: _toSharedMemory(value) for key, value in result.items()}
+    # subclasses such as masked arrays are pickled to keep their attributes
+    if type(result) not in (np.ndarray, u.Quantity) or result.dtype.hasobject or result.nbytes == 0:
+        return result
+    unit = None
+    if isinstance(result, u.Quantity):
+        unit = result.unit.to_string()
+        result = result.value
+    # the parent process owns the block from now on and unlinks it, so the
+    # worker does not track it
+    if sys.version_info >= (3, 13):
+        shm = SharedMemory(create=True, size=result.nbytes, track=False)
+    else:
+        shm = SharedMemory(create=True, size=result.nbytes)
+        if os.name == "posix":
+            resource_tracker.unregister(shm._name, "shared_memory")
+    np.ndarray(result.shape, dtype=result.dtype, buffer=shm.buf)[...] = result
+    shm.close()
+    return _SharedArray(shm.name, result.shape, result.dtype.str, unit)
+
+
+def _fromSharedMemory(result):
+    """Copy the arrays of a result from shared memory and release the
+    memory blocks."""
+    if isinstance(result, dict):
+        return {key: _fromSharedMemory(value) for key, value in result.items()}
+    if not isinstance(result, _SharedArray):
+        return result
+    shm = SharedMemory(name=result.name)
+    try:
+        array = np.ndarray(result.shape, dtype=result.dtype, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+    if result.unit is not None:
+        array = u.Quantity(array, result.unit, copy=False)
+    return array
+
+
+def _mapSpectrum(func, row, type, date):
+    star = getCalspecCatalog()[row]
+    try:
+        spectrum = star.get_spectrum_numpy(type=type, date=date)
+    except (ValueError, RuntimeError) as e:
+        return _Skipped(str(e))
+    return _toSharedMemory(func(spectrum))
+
+
+def map_spectra(
+    func, stars=None, type="stis", date="latest", workers=None, max_pending=None, mp_context=None
+):
+    """Apply a function to the spectra of many stars in a pool of processes,
+    and yield the results in the order of the stars.
+
+    Each worker process loads the Calspec tables once. The numpy arrays and
+    Quantities returned by func, alone or as values of a dict, are sent back
+    through shared memory instead of being pickled. At most max_pending
+    results are computed ahead of the one being yielded, which bounds the
+    memory used.
+
+    Parameters
+    ----------
+    func: callable
+        A picklable function (e.g. defined at module level) called with the
+        dictionary of get_spectrum_numpy() for each star.
+    stars: list, optional
+        The Calspec objects of the catalog returned by getCalspecCatalog(),
+        or star names (default: None, all Calspec stars).
+    type: str
+        Choose between STIS or model spectrum. Must be either 'stis'
+        or 'mod' (default: 'stis').
+    date: str
+        Use the most recent files before the given date, as in
+        Calspec.get_spectrum_fits_filename() (default: 'latest').
+    workers: int, optional
+        Number of worker processes (default: None, the number of CPUs).
+    max_pending: int, optional
+        Maximum number of results computed ahead (default: None, twice the
+        number of workers).
+    mp_context: multiprocessing context, optional
+        The context used to start the worker processes (default: None, the
+        default context of the platform). Worker processes which are not
+        forked do not inherit a temporary astropy cache of the parent.
+
+    Yields
+    ------
+    star: Calspec
+        The Calspec star. Stars without the requested spectrum are skipped.
+    result:
+        The output of func for the spectrum of the star.
+
+    Examples
+    --------
+    >>> def get_max_flux(spectrum):
+    ...     return spectrum["FLUX"].max()
+    >>> results = map_spectra(get_max_flux, stars=["eta1 dor", "mu col"],
+    ...                       workers=2)
+    >>> for star, max_flux in results:
+    ...     print(star, max_flux)   #doctest: +ELLIPSIS
+    eta1dor ...
+    mucol ...
+    """
+    logger = logging.getLogger()
+    stars = _getStars(stars)
+    catalog = getCalspecCatalog()
+    for star in stars:
+        # the workers look the rows up in their own copy of the shared
+        # catalog, built from the same tables
+        if star._catalog is not catalog:
+            raise ValueError(f"{star.Name} is not a star of the shared Calspec catalog.")
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if max_pending is None:
+        max_pending = 2 * workers
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context, initializer=_initWorker) as executor:
+        try:
+            for star in stars:
+                pending.append((star, executor.submit(_mapSpectrum, func, star._row, type, date)))
+                while len(pending) > max_pending:
+                    yield from _yieldResult(pending.popleft(), logger)
+            while pending:
+                yield from _yieldResult(pending.popleft(), logger)
+        finally:
+            # release the shared memory of results which were not yielded
+            for star, future in pending:
+                if not future.cancel() and future.exception() is None:
+                    _fromSharedMemory(future.result())
+
+
+def _yieldResult(item, logger):
+    star, future = item
+    result = future.result()
+    if isinstance(result, _Skipped):
+        logger.warning(f"Skipping {star.Name}: {result.message}")
+        return
+    yield star, _fromSharedMemory(result)
@@ -0,0 +1,124 @@
+import os
+import logging
+import numpy as np
+from astropy import units as u
+
+from getCalspec.getCalspec import _FITS_UNITS
+from getCalspec.batch import _getStars
+
+__all__ = [
+    "export_spectra_dataset",
+    "SPECTRUM_DATASET_UNITS",
+]
+
+# units of the spectrum columns in the exported datasets
+SPECTRUM_DATASET_UNITS = {
+    "wavelength": u.angstrom,
+    "flux": u.erg / u.second / u.cm**2 / u.angstrom,
+    "staterror": u.erg / u.second / u.cm**2 / u.angstrom,
+    "syserror": u.erg / u.second / u.cm**2 / u.angstrom,
+}
+
+
+def _getSpectrumDatasetSchema():
+    import pyarrow as pa
+
+    fields = [
+        pa.field("star", pa.string()),
+        pa.field("version", pa.int32()),
+        pa.field("type", pa.string()),
+    ]
+    for name, unit in SPECTRUM_DATASET_UNITS.items():
+        fields.append(pa.field(name, pa.float64(), metadata={"unit": unit.to_string()}))
+    return pa.schema(fields)
+
+
+def _getSpectrumDatasetTable(star, type, date, schema):
+    """Make the table of one spectrum with the columns of the exported
+    datasets, converted to SPECTRUM_DATASET_UNITS. Columns absent from the
+    FITS file are filled with NaN."""
+    import pyarrow as pa
+
+    filename = star.get_spectrum_fits_filename(type=type, date=date)
+    version = int(os.path.splitext(filename)[0].split("_")[-1])
+    tab = star.get_spectrum_table(type=type, date=date)
+    units = {col.name.lower(): col.unit for col in tab.columns}
+    nrows = len(tab)
+    columns = {
+        "star": pa.array([star.Name] * nrows, pa.string()),
+        "version": pa.array(np.full(nrows, version, dtype=np.int32)),
+        "type": pa.array([type] * nrows, pa.string()),
+    }
+    for name, unit in SPECTRUM_DATASET_UNITS.items():
+        if name in units:
+            data = np.asarray(tab[name.upper()], dtype=np.float64)
+            if units[name] in _FITS_UNITS and _FITS_UNITS[units[name]] != unit:
+                data = data * _FITS_UNITS[units[name]].to(unit)
+        else:
+            data = np.full(nrows, np.nan)
+        columns[name] = pa.array(data)
+    return pa.Table.from_pydict(columns, schema=schema)
+
+
+def export_spectra_dataset(path, stars=None, types=("stis", "mod"), date="latest", max_rows_per_group=16384):
+    """Write Calspec spectra to a Parquet dataset partitioned by star and
+    type, to be read in parallel by distributed engines. Requires pyarrow.
+
+    The dataset has columns star, version, type, wavelength, flux,
+    staterror and syserror, with the units of SPECTRUM_DATASET_UNITS in the
+    field metadata. Spectra are written in the wavelength order of the FITS
+    files, in row groups of at most max_rows_per_group rows, so that
+    filters on wavelength can skip row groups from their statistics. Files
+    previously written for the same star and type are replaced.
+
+    Parameters
+    ----------
+    path: str
+        The root directory of the dataset.
+    stars: list, optional
+        The Calspec objects or star names to export (default: None, all
+        Calspec stars).
+    types: tuple
+        The spectrum types to export, among 'stis' and 'mod' (default:
+        ('stis', 'mod')).
+    date: str
+        Export the most recent files before the given date, as in
+        Calspec.get_spectrum_fits_filename() (default: 'latest').
+    max_rows_per_group: int
+        Maximum number of rows in each Parquet row group (default: 16384).
+
+    Examples
+    --------
+    >>> export_spectra_dataset("calspec_dataset", stars=["eta1 dor"],
+    ...                        types=["stis"])
+    >>> import pyarrow.dataset as ds
+    >>> dataset = ds.dataset("calspec_dataset", format="parquet",
+    ...                      partitioning="hive")
+    >>> cut = (ds.field("star") == "eta1dor") & (ds.field("wavelength") < 3000)
+    >>> t = dataset.to_table(filter=cut)
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    logger = logging.getLogger()
+    stars = _getStars(stars)
+    schema = _getSpectrumDatasetSchema()
+    partitioning = ds.partitioning(pa.schema([schema.field("star"), schema.field("type")]), flavor="hive")
+    for star in stars:
+        tables = []
+        for type in types:
+            try:
+                tables.append(_getSpectrumDatasetTable(star, type, date, schema))
+            except (ValueError, RuntimeError) as e:
+                logger.warning(f"Skipping {type} spectrum of {star.Name}: {e}")
+        if len(tables) == 0:
+            continue
+        ds.write_dataset(
+            pa.concat_tables(tables),
+            path,
+            format="parquet",
+            partitioning=partitioning,
+            basename_template="part-{i}.parquet",
+            existing_data_behavior="delete_matching",
+            max_rows_per_group=max_rows_per_group,
+        )
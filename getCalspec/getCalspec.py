@@ -2,10 +2,18 @@ import numpy as np
 import matplotlib.pyplot as plt
 import pandas as pd
 import os
+import hashlib
+import logging
+import threading
 import warnings
+from collections import OrderedDict
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from urllib.error import URLError
 from astropy import units as u
+from astropy.coordinates import Angle
 from astropy.io import fits
+from astropy.time import Time
 from astropy.utils.data import download_file
 
 
@@ -13,8 +21,13 @@ __all__ = [
     "get_calspec_keys",
     "is_calspec",
     "Calspec",
+    "CalspecCatalog",
+    "SpectrumCache",
+    "SpectrumInterpolator",
+    "plot_spectra",
     "_getPackageDir",
     "getCalspecDataFrame",
+    "getCalspecCatalog",
     "CALSPEC_ARCHIVE",
 ]
 
@@ -25,21 +38,186 @@ __all__ = [
 # then be picked up when we update the tables
 CALSPEC_ARCHIVE = r"https://archive.stsci.edu/hlsps/reference-atlases/cdbs/calspec/"
 
+# reference epoch of the RA/Decl columns of the Calspec table
+CALSPEC_EPOCH = Time("J2000.0")
+
+# astropy units of the column units found in the Calspec FITS files
+_FITS_UNITS = {
+    "ANGSTROMS": u.angstrom,
+    "NANOMETERS": u.nanometer,
+    "FLAM": u.erg / u.second / u.cm**2 / u.angstrom,
+    "SEC": u.second,
+}
+
 
 def getCalspecDataFrame():
-    dirname = _getPackageDir()
-    filename = os.path.join(dirname, "../calspec_data/calspec.csv")
-    df = pd.read_csv(filename)
-    return df
+    return _loadTable("calspec").copy()
 
 
 def getHistoryDataFrame():
+    return _loadTable("history").copy()
+
+
+def _calspecFromRow(row):
+    """Unpickle a Calspec object of the shared catalog."""
+    return Calspec._fromRow(getCalspecCatalog(), row)
+
+
+def getCalspecCatalog():
+    """Return the CalspecCatalog shared by all Calspec objects of this
+    process."""
+    catalog = _TABLES.get("catalog")
+    if catalog is None:
+        with _TABLES_LOCK:
+            if "catalog" not in _TABLES:
+                _TABLES["catalog"] = CalspecCatalog(_loadTable("calspec"))
+            catalog = _TABLES["catalog"]
+    return catalog
+
+
+# tables and catalog loaded in this process, keyed by name. They are never
+# modified once loaded, so they are read without lock by concurrent threads.
+_TABLES = {}
+_TABLES_LOCK = threading.RLock()
+
+# warnings.catch_warnings() changes the warning filters of the whole process
+_WARNINGS_LOCK = threading.Lock()
+
+# interpolators of the most recently used spectra, keyed by FITS file name
+_INTERPOLATORS = OrderedDict()
+_INTERPOLATORS_LOCK = threading.Lock()
+_MAX_INTERPOLATORS = 32
+
+
+def _getDataFilename(name, ext):
     dirname = _getPackageDir()
-    filename = os.path.join(dirname, "../calspec_data/history.csv")
-    df = pd.read_csv(filename)
+    return os.path.abspath(os.path.join(dirname, "../calspec_data", name + ext))
+
+
+def _loadTable(name):
+    """Load a table from calspec_data once per process, from its binary form
+    if available, from the csv file otherwise."""
+    df = _TABLES.get(name)
+    if df is None:
+        with _TABLES_LOCK:
+            if name not in _TABLES:
+                df = _readBinaryTable(name)
+                if df is None:
+                    df = _readCsvTable(name)
+                _TABLES[name] = df
+            df = _TABLES[name]
+    return df
+
+
+def _getFileVersions():
+    """Return the file versions of each star in the history table, keyed by
+    (Name, type), built once per process. Each value holds the sorted
+    datetime64 dates of the files and, for each date, the extension of the
+    last file of the table dated on or before it, so that dates are resolved
+    with np.searchsorted instead of a scan of the table."""
+    versions = _TABLES.get("versions")
+    if versions is None:
+        with _TABLES_LOCK:
+            if "versions" not in _TABLES:
+                _TABLES["versions"] = _makeFileVersions(_loadTable("history"))
+            versions = _TABLES["versions"]
+    return versions
+
+
+def _makeFileVersions(history):
+    versions = {}
+    dated = history[history["Date"].notna()]
+    for type in ["stis", "mod"]:
+        rows = dated[dated["Extension"].str.contains(type)]
+        for name, group in rows.groupby("Name", sort=False):
+            dates = group["Date"].to_numpy(dtype="datetime64[ns]")
+            order = np.argsort(dates, kind="stable")
+            # the last row of the table dated on or before each sorted date
+            last = np.maximum.accumulate(order)
+            extensions = group["Extension"].to_numpy(dtype=object)[last]
+            versions[(name, type)] = (dates[order], extensions)
+    return versions
+
+
+@lru_cache(maxsize=256)
+def _parseDate(date):
+    return pd.Timestamp(date).to_datetime64().astype("datetime64[ns]")
+
+
+def _clearTableCache():
+    with _TABLES_LOCK:
+        _TABLES.clear()
+
+
+def _readCsvTable(name):
+    """Read and normalize a table from its csv file."""
+    filename = _getDataFilename(name, ".csv")
+    if name == "calspec":
+        # Gaia source ids do not fit exactly in float64
+        df = pd.read_csv(filename, dtype={"source_id": "Int64"})
+        df["Aliases"] = _getAliases(df)
+    elif name == "history":
+        df = pd.read_csv(filename)
+        df["Date"] = pd.to_datetime(df["Date"], format="mixed")
+    else:
+        raise ValueError(f"Unknown table {name=}.")
+    df.attrs["csv_sha256"] = _getFileHash(filename)
     return df
 
 
+def _getFileHash(filename):
+    with open(filename, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _readBinaryTable(name):
+    """Read the Parquet form of a table written by the rebuild step. Return
+    None if it is missing, unreadable, was not written from the current csv
+    file, or if pyarrow is not installed.
+    """
+    filename = _getDataFilename(name, ".parquet")
+    if not os.path.isfile(filename):
+        return None
+    try:
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(filename)
+    except (ImportError, OSError, ValueError):  # pyarrow.ArrowInvalid is a ValueError
+        return None
+    metadata = table.schema.metadata or {}
+    csv_hash = _getFileHash(_getDataFilename(name, ".csv"))
+    if metadata.get(b"csv_sha256", b"").decode() != csv_hash:
+        return None
+    df = table.to_pandas()
+    df.attrs["csv_sha256"] = csv_hash
+    return df
+
+
+def _writeBinaryTable(df, name):
+    """Write the Parquet form of a table read by _readCsvTable(), with the
+    hash of its csv file in the Arrow schema metadata. Requires pyarrow."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[b"csv_sha256"] = df.attrs["csv_sha256"].encode()
+    pq.write_table(table.replace_schema_metadata(metadata), _getDataFilename(name, ".parquet"))
+
+
+def _getAliases(df):
+    """Join the sanitized names of each star from all the *_name columns,
+    as '|name1|name2|' strings."""
+    name_columns = [name for name in df.columns if "_name" in name.lower()]
+    if len(name_columns) == 0:
+        raise KeyError("No column label with _name in calspec.csv")
+    aliases = pd.Series("|", index=df.index)
+    for name in name_columns:
+        labels = sanitizeDataFrame(df[name].fillna("").astype(str))
+        aliases += labels.where(labels == "", labels + "|")
+    return aliases
+
+
 def _getPackageDir():
     """This method must live in the top level of this package, so if this
     moves to a utils file then the returned path will need to account for that.
@@ -82,16 +260,9 @@ def get_calspec_keys(star_label):
     ...
     """
     label = sanitizeString(star_label)
-    df = getCalspecDataFrame()
-    name_columns = [name for name in df.columns if "_name" in name.lower()]
-    if len(name_columns) > 0:
-        keys = pd.Series([False] * len(df))
-        for name in name_columns:
-            tmp_df = sanitizeDataFrame(df[name])
-            keys = keys | (tmp_df == label)
-        return keys
-    else:
-        raise KeyError("No column label with _name in calspec.csv")
+    aliases = _loadTable("calspec")["Aliases"]
+    keys = aliases.str.contains(f"|{label}|", regex=False)
+    return keys
 
 
 def is_calspec(star_label):
@@ -122,8 +293,16 @@ class Calspec:
     https://www.stsci.edu/hst/instrumentation/reference-data-for-calibration-and-tools/astronomical-catalogs/calspec.html
     loaded from its Simbad name.
 
+    A Calspec object is a lightweight view on one row of a CalspecCatalog:
+    the columns of the Calspec table are read as attributes (e.g. .Name,
+    .STIS, .source_id) from the columnar store of the catalog. The catalog
+    and the tables are loaded once per process and never modified, so
+    Calspec objects and their methods can be used by concurrent threads.
+
     """
 
+    __slots__ = ("label", "_catalog", "_row", "wavelength", "flux", "stat", "syst")
+
     def __init__(self, calspec_label):
         """
 
@@ -150,22 +329,80 @@ class Calspec:
         mucol
         """
         self.label = sanitizeString(calspec_label)
-        test = is_calspec(self.label)
-        if not test:
+        catalog = getCalspecCatalog()
+        row = catalog._alias_rows.get(self.label)
+        if row is None:
             raise KeyError(f"{calspec_label} not found in Calspec tables.")
-        df = getCalspecDataFrame()
-        row = df[get_calspec_keys(self.label)]
-        self.query = row
-        for col in row.columns:  # sets .STIS and .Name attributes
-            setattr(self, col, row[col].values[0])
+        self._catalog = catalog
+        self._row = row
         self.wavelength = None
         self.flux = None
         self.stat = None
         self.syst = None
 
+    @classmethod
+    def _fromRow(cls, catalog, row):
+        """Make the Calspec object of a catalog row without any label
+        lookup."""
+        self = cls.__new__(cls)
+        self.label = sanitizeString(catalog._columns["Star_name"][row])
+        self._catalog = catalog
+        self._row = row
+        self.wavelength = None
+        self.flux = None
+        self.stat = None
+        self.syst = None
+        return self
+
+    def __reduce__(self):
+        # the shared catalog is not pickled, the row is looked up again in
+        # the catalog of the process which unpickles the object
+        state = {slot: getattr(self, slot) for slot in ("label", "wavelength", "flux", "stat", "syst")}
+        if self._catalog is getCalspecCatalog():
+            return _calspecFromRow, (self._row,), (None, state)
+        return Calspec._fromRow, (self._catalog, self._row), (None, state)
+
+    def __getattr__(self, name):
+        # called only for names which are not slots, i.e. for table columns
+        if name.startswith("_"):
+            raise AttributeError(name)
+        columns = self._catalog._columns
+        if name not in columns:
+            raise AttributeError(f"'Calspec' object has no attribute '{name}'")
+        return columns[name][self._row]
+
+    def __dir__(self):
+        return sorted(set(super().__dir__()) | set(self._catalog._columns))
+
     def __str__(self):
         return self.Name
 
+    @property
+    def query(self):
+        """The row of the Calspec table as a one-row DataFrame."""
+        return self._catalog.df.iloc[[self._row]]
+
+    @property
+    def ra(self):
+        """Right ascension at epoch J2000 in degrees."""
+        return float(self._catalog.ra[self._row])
+
+    @property
+    def dec(self):
+        """Declination at epoch J2000 in degrees."""
+        return float(self._catalog.dec[self._row])
+
+    @property
+    def pmra(self):
+        """Proper motion in right ascension (including cos(Decl)) in
+        mas/yr."""
+        return float(self._catalog.pmra[self._row])
+
+    @property
+    def pmdec(self):
+        """Proper motion in declination in mas/yr."""
+        return float(self._catalog.pmdec[self._row])
+
     def _sanitizeName(self, name):
         """Special casing for cleaning up names in the table for use in
         downloading.
@@ -199,12 +436,10 @@ class Calspec:
         """
         if type.lower() not in ["stis", "mod"]:
             raise ValueError(f"Type argument must be either 'stis' or 'mod'. Got {type=}.")
-        versions = getHistoryDataFrame()
-        versions.sort_values("Filename")  # ensure table is ordered in time
+        versions = _loadTable("history")  # shared table, only read here
         rows = versions.loc[
             (versions["Name"] == self.Name) & (versions["Extension"].str.contains(type.lower()))
         ]
-        rows.loc[:, "Date"] = pd.to_datetime(rows["Date"], format="mixed")
         return rows
 
     def get_spectrum_fits_filename(self, type="stis", date="latest"):
@@ -219,7 +454,7 @@ class Calspec:
         date: str
             The most recent file before the given date will be returned
             (default: 'latest'). One can use all datetime formats understood
-            by pandas `to_datetime()` method.
+            by `pandas.Timestamp`.
 
         Returns
         -------
@@ -240,14 +475,21 @@ class Calspec:
             elif type == "stis":
                 extension = self.STIS
         else:
-            rows = self.get_file_dataframe(type=type)
-            dt = pd.to_datetime(date)
-            if dt < min(rows["Date"]):
+            if type.lower() not in ["stis", "mod"]:
+                raise ValueError(f"Type argument must be either 'stis' or 'mod'. Got {type=}.")
+            versions = _getFileVersions().get((self.Name, type.lower()))
+            if versions is None:
+                raise ValueError(f"No {type} spectrum is available for {self.Name}.")
+            dates, extensions = versions
+            dt = _parseDate(date)
+            index = np.searchsorted(dates, dt, side="right") - 1
+            if index < 0:
                 raise ValueError(
-                    f"Given {date=} is lower than the oldest available date {min(rows['Date'])=}."
+                    f"Given {date=} is lower than the oldest available date {pd.Timestamp(dates[0])}."
                 )
-            latest_row_before_date = rows.loc[max(rows[rows["Date"] <= dt].index)]
-            extension = latest_row_before_date["Extension"]
+            extension = extensions[index]
+        if not isinstance(extension, str):
+            raise ValueError(f"No {type} spectrum is available for {self.Name}.")
         spectrum_file_name = self._sanitizeName(self.Name) + extension.replace("*", "") + ".fits"
         return spectrum_file_name
 
@@ -276,12 +518,7 @@ class Calspec:
 
         """
         spectrum_file_name = self.get_spectrum_fits_filename(type=type, date=date)
-        url = CALSPEC_ARCHIVE + spectrum_file_name
-        try:
-            output_file_name = download_file(url, cache=True)
-        except URLError as e:
-            raise RuntimeError(f"Failed to get data for {self.Name} from {url}") from e
-        return output_file_name
+        return _downloadSpectrumFile(spectrum_file_name, self.Name)
 
     def get_spectrum_table(self, type="stis", date="latest"):
         """
@@ -302,15 +539,27 @@ class Calspec:
 
         """
         output_file_name = self.download_spectrum_fits_filename(type=type, date=date)
-        with warnings.catch_warnings():  # calspec fits files use non-astropy units everywhere
-            warnings.filterwarnings("ignore", message=".*did not parse as fits unit")
-            t = fits.getdata(output_file_name)
-        return t
+        return _readSpectrumTable(output_file_name)
 
-    def get_spectrum_numpy(self, type="stis", date="latest"):
+    def get_spectrum_numpy(self, type="stis", date="latest", columns=None, dtype=None):
         """Make a dictionary of numpy arrays with astropy units from Calspec
         FITS file.
 
+        Parameters
+        ----------
+        type: str
+            Choose between STIS or model spectrum. Must be either 'stis'
+            or 'mod' (default: 'stis').
+        date: str
+            The most recent file before the given date is used
+            (default: 'latest').
+        columns: list, optional
+            Names of the FITS table columns to load (default: None, all
+            columns).
+        dtype: numpy.dtype, optional
+            Type the floating point columns are converted to, e.g. np.float32
+            to reduce memory usage (default: None, the FITS column types).
+
         Returns
         -------
         table: dict
@@ -322,42 +571,887 @@ class Calspec:
         >>> dict = c.get_spectrum_numpy()
         >>> print(dict)   #doctest: +ELLIPSIS
         {'WAVELENGTH': <Quantity [...
+        >>> dict = c.get_spectrum_numpy(columns=["WAVELENGTH", "FLUX"],
+        ...                             dtype=np.float32)
+        >>> print(dict["FLUX"].dtype)
+        float32
 
         """
         tab = self.get_spectrum_table(type=type, date=date)
-        d = {}
-        ncols = len(tab.columns)
-        for k in range(ncols):
-            d[tab.columns[k].name] = np.copy(tab[tab.columns[k].name][:])
-            if tab.columns[k].unit == "ANGSTROMS":
-                d[tab.columns[k].name] *= u.angstrom
-            elif tab.columns[k].unit == "NANOMETERS":
-                d[tab.columns[k].name] *= u.nanometer
-            elif tab.columns[k].unit == "FLAM":
-                d[tab.columns[k].name] *= u.erg / u.second / u.cm**2 / u.angstrom
-            elif tab.columns[k].unit == "SEC":
-                d[tab.columns[k].name] *= u.second
-        return d
-
-    def plot_spectrum(self, xscale="log", yscale="log"):
+        return _spectrumTableToNumpy(tab, columns=columns, dtype=dtype)
+
+    def get_version_dataframe(self, type="stis"):
+        """Get the rows from the history.csv table of all the versions of a
+        spectrum, ordered from the oldest to the latest.
+
+        Parameters
+        ----------
+        type: str
+            Choose between STIS or model spectrum. Must be either 'stis'
+            or 'mod' (default: 'stis').
+
+        Returns
+        -------
+        rows: pandas.DataFrame
+            The rows from the history.csv file.
+
+        Examples
+        --------
+        >>> c = Calspec("eta1 dor")
+        >>> rows = c.get_version_dataframe(type="mod")
+        >>> list(rows["Filename"])   #doctest: +ELLIPSIS
+        ['eta1dor_mod_001.fits', 'eta1dor_mod_002.fits', ...]
+        """
+        rows = self.get_file_dataframe(type=type)
+        if len(rows) == 0:
+            raise ValueError(f"No {type} spectrum is listed in history.csv for {self.Name}.")
+        return rows.sort_values(["Date", "Filename"], na_position="first")
+
+    def get_all_versions(self, type="stis", wavelength=None, max_workers=8):
+        """Get all the versions of a spectrum listed in the history.csv table
+        on a common wavelength grid, with the flux ratios between successive
+        versions. The files are downloaded and read concurrently.
+
+        Parameters
+        ----------
+        type: str
+            Choose between STIS or model spectrum. Must be either 'stis'
+            or 'mod' (default: 'stis').
+        wavelength: astropy.units.Quantity, optional
+            The common wavelength grid (default: None, the grid of the
+            latest version).
+        max_workers: int
+            Number of files downloaded and read at once (default: 8).
+
+        Returns
+        -------
+        versions: dict
+            A dictionary with the list of version file names ("FILENAME")
+            and dates ("DATE") from the oldest to the latest, the common
+            grid ("WAVELENGTH"), the "FLUX", "STATERROR" and "SYSERROR"
+            Quantities of shape (number of versions, number of wavelengths),
+            NaN outside the wavelength range of a version, and the "RATIO"
+            array of each version flux over the previous one, of shape
+            (number of versions - 1, number of wavelengths).
+
+        Examples
+        --------
+        >>> c = Calspec("eta1 dor")
+        >>> versions = c.get_all_versions(type="stis")
+        >>> versions["FILENAME"]   #doctest: +ELLIPSIS
+        ['eta1dor_stis_001.fits', 'eta1dor_stis_002.fits', ...]
+        >>> versions["RATIO"].shape[0] == len(versions["FILENAME"]) - 1
+        True
+        """
+        rows = self.get_version_dataframe(type=type)
+        filenames = list(rows["Filename"])
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            spectra = list(executor.map(_loadSpectrumFile, filenames, [self.Name] * len(filenames)))
+        return _combineVersions(filenames, rows["Date"].to_numpy(), spectra, wavelength=wavelength)
+
+    def to_arrow(self, type="stis", date="latest"):
+        """Make a pyarrow Table from Calspec FITS file. Requires pyarrow.
+
+        The FITS columns are only converted to native byte order, which is
+        the single copy made, and are then wrapped by Arrow without copy.
+
+        Returns
+        -------
+        table: pyarrow.Table
+            The FITS table columns with lower case names, with their astropy
+            units in the "unit" field metadata.
+
+        Examples
+        --------
+        >>> c = Calspec("eta1 dor")
+        >>> t = c.to_arrow()
+        >>> t.column_names   #doctest: +ELLIPSIS
+        ['wavelength', 'flux', 'staterror', 'syserror', ...]
+        >>> t.schema.field("wavelength").metadata
+        {b'unit': b'Angstrom'}
+
+        """
+        import pyarrow as pa
+
+        tab = self.get_spectrum_table(type=type, date=date)
+        arrays = []
+        fields = []
+        for col in tab.columns:
+            data = tab[col.name]
+            data = np.ascontiguousarray(data.astype(data.dtype.newbyteorder("="), copy=False))
+            metadata = {"unit": _FITS_UNITS[col.unit].to_string()} if col.unit in _FITS_UNITS else None
+            arrays.append(pa.array(data))
+            fields.append(pa.field(col.name.lower(), arrays[-1].type, metadata=metadata))
+        return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+    def get_interpolator(self, type="stis", date="latest", kind="linear"):
+        """Get the interpolator of a spectrum. Interpolators of the most
+        recently used spectra are kept in memory and shared by all Calspec
+        objects.
+
+        Parameters
+        ----------
+        type: str
+            Choose between STIS or model spectrum. Must be either 'stis'
+            or 'mod' (default: 'stis').
+        date: str
+            The most recent file before the given date is used
+            (default: 'latest').
+        kind: str
+            Interpolation method, either 'linear' or 'nearest'
+            (default: 'linear').
+
+        Returns
+        -------
+        interpolator: SpectrumInterpolator
+            The interpolator of the spectrum.
+
+        Examples
+        --------
+        >>> c = Calspec("eta1 dor")
+        >>> c.get_interpolator() is c.get_interpolator(date="latest")
+        True
+        """
+        key = (self.get_spectrum_fits_filename(type=type, date=date), kind)
+        with _INTERPOLATORS_LOCK:
+            if key in _INTERPOLATORS:
+                _INTERPOLATORS.move_to_end(key)
+                return _INTERPOLATORS[key]
+        spectrum = self.get_spectrum_numpy(type=type, date=date, columns=None)
+        interpolator = SpectrumInterpolator(spectrum, kind=kind)
+        with _INTERPOLATORS_LOCK:
+            interpolator = _INTERPOLATORS.setdefault(key, interpolator)
+            _INTERPOLATORS.move_to_end(key)
+            while len(_INTERPOLATORS) > _MAX_INTERPOLATORS:
+                _INTERPOLATORS.popitem(last=False)
+        return interpolator
+
+    def flux_at(self, wavelengths, type="stis", date="latest", kind="linear"):
+        """Evaluate the flux and its uncertainties at arbitrary wavelengths,
+        with the cached interpolator of the spectrum.
+
+        Parameters
+        ----------
+        wavelengths: array_like or astropy.units.Quantity
+            The wavelengths, in the unit of the spectrum (Angstrom) if they
+            are not a Quantity.
+        type: str
+            Choose between STIS or model spectrum. Must be either 'stis'
+            or 'mod' (default: 'stis').
+        date: str
+            The most recent file before the given date is used
+            (default: 'latest').
+        kind: str
+            Interpolation method, either 'linear' or 'nearest'
+            (default: 'linear').
+
+        Returns
+        -------
+        table: dict
+            A dictionary with the interpolated "FLUX" and, when present in
+            the spectrum, its propagated "STATERROR" and "SYSERROR"
+            Quantities, of the shape of wavelengths. They are NaN outside
+            the wavelength range of the spectrum.
+
+        Examples
+        --------
+        >>> c = Calspec("eta1 dor")
+        >>> f = c.flux_at([5000, 6000] * u.angstrom)
+        >>> print(f["FLUX"])   #doctest: +ELLIPSIS
+        [...] erg / (Angstrom s cm2)
+        """
+        return self.get_interpolator(type=type, date=date, kind=kind)(wavelengths)
+
+    def plot_spectrum(
+        self,
+        xscale="log",
+        yscale="log",
+        type="stis",
+        date="latest",
+        ax=None,
+        decimate=True,
+        show=True,
+        label=None,
+    ):
         """Plot Calspec spectrum.
 
+        Parameters
+        ----------
+        xscale: str
+            Scale of the wavelength axis (default: 'log').
+        yscale: str
+            Scale of the flux axis (default: 'log').
+        type: str
+            Choose between STIS or model spectrum. Must be either 'stis'
+            or 'mod' (default: 'stis').
+        date: str
+            The most recent file before the given date is plotted
+            (default: 'latest').
+        ax: matplotlib.axes.Axes, optional
+            Plot in these axes, to overlay several spectra (default: None,
+            plot in a new figure).
+        decimate: bool
+            If True, plot only the minimum and maximum flux points in each
+            pixel column of the axes (default: True).
+        show: bool
+            If True, show the figure with matplotlib.pyplot.show() when it
+            is created by this method (default: True).
+        label: str, optional
+            Legend label of the spectrum (default: None).
+
+        Returns
+        -------
+        fig: matplotlib.figure.Figure
+            The figure of the plot.
+
         Examples
         --------
         >>> c = Calspec("eta1 dor")
-        >>> c.plot_spectrum()
+        >>> c.plot_spectrum()   #doctest: +ELLIPSIS
+        <Figure ...>
 
         """
-        t = self.get_spectrum_numpy()
-        _ = plt.figure()
-        plt.errorbar(t["WAVELENGTH"].value, t["FLUX"].value, yerr=t["STATERROR"].value)
-        plt.grid()
-        plt.yscale(yscale)
-        plt.xscale(xscale)
-        plt.title(self.label)
-        plt.xlabel(rf"$\lambda$ [{t['WAVELENGTH'].unit}]")
-        plt.ylabel(rf"Flux [{t['FLUX'].unit}]")
+        t = self.get_spectrum_numpy(type=type, date=date)
+        new_figure = ax is None
+        if new_figure:
+            fig, ax = plt.subplots()
+        else:
+            fig = ax.figure
+        x = t["WAVELENGTH"].value
+        y = t["FLUX"].value
+        yerr = t["STATERROR"].value if "STATERROR" in t else None
+        if decimate:
+            width = int(np.ceil(ax.get_window_extent().width))
+            index = _decimateMinMax(x, y, width, log=(xscale == "log"))
+            x, y = x[index], y[index]
+            yerr = yerr[index] if yerr is not None else None
+        ax.errorbar(x, y, yerr=yerr, label=label)
+        ax.grid(True)
+        ax.set_yscale(yscale)
+        ax.set_xscale(xscale)
+        ax.set_xlabel(rf"$\lambda$ [{t['WAVELENGTH'].unit}]")
+        ax.set_ylabel(rf"Flux [{t['FLUX'].unit}]")
+        if new_figure:
+            ax.set_title(self.label)
+            if show:
+                plt.show()
+        return fig
+
+
+def plot_spectra(
+    stars, type="stis", dates=("latest",), xscale="log", yscale="log", decimate=True, show=False
+):
+    """Overlay the spectra of several stars, or of several versions of their
+    spectra, in one figure.
+
+    Parameters
+    ----------
+    stars: list
+        The Calspec objects or star names. Spectra which are not available
+        are skipped.
+    type: str
+        Choose between STIS or model spectrum. Must be either 'stis'
+        or 'mod' (default: 'stis').
+    dates: list
+        The most recent file before each date is plotted for each star
+        (default: ('latest',)).
+    xscale: str
+        Scale of the wavelength axis (default: 'log').
+    yscale: str
+        Scale of the flux axis (default: 'log').
+    decimate: bool
+        If True, plot only the minimum and maximum flux points in each
+        pixel column of the axes (default: True).
+    show: bool
+        If True, show the figure with matplotlib.pyplot.show()
+        (default: False).
+
+    Returns
+    -------
+    fig: matplotlib.figure.Figure
+        The figure of the plot, to be closed with matplotlib.pyplot.close()
+        when plotting many figures without showing them.
+
+    Examples
+    --------
+    >>> fig = plot_spectra(["eta1 dor", "mu col"],
+    ...                    dates=["2021-01-01", "latest"])
+    """
+    logger = logging.getLogger()
+    fig, ax = plt.subplots()
+    try:
+        for star in stars:
+            if not isinstance(star, Calspec):
+                star = Calspec(star)
+            for date in dates:
+                label = f"{star.Name} {type}" + (f" {date}" if len(dates) > 1 else "")
+                try:
+                    star.plot_spectrum(
+                        xscale=xscale,
+                        yscale=yscale,
+                        type=type,
+                        date=date,
+                        ax=ax,
+                        decimate=decimate,
+                        label=label,
+                    )
+                except (ValueError, RuntimeError) as e:
+                    logger.warning(f"Skipping {label}: {e}")
+        if ax.has_data():
+            ax.legend()
+    except BaseException:
+        plt.close(fig)
+        raise
+    if show:
         plt.show()
+    return fig
+
+
+def _decimateMinMax(x, y, nbins, log=False):
+    """Return the sorted indices of the points of minimum and maximum y in
+    nbins bins of equal width in x, or in log10(x) if log is True. This
+    keeps the envelope of a dense curve drawn on nbins pixels."""
+    if len(x) <= 2 * nbins:
+        return np.arange(len(x))
+    finite = np.flatnonzero(np.isfinite(x) & np.isfinite(y) & ((x > 0) | (not log)))
+    xb = np.log10(x[finite]) if log else x[finite]
+    edges = np.linspace(xb.min(), xb.max(), nbins + 1)
+    bins = np.clip(np.searchsorted(edges, xb, side="right") - 1, 0, nbins - 1)
+    # sort each bin by y: the first and last points of each bin are its
+    # minimum and maximum
+    order = np.lexsort((y[finite], bins))
+    starts = np.flatnonzero(np.r_[True, bins[order][1:] != bins[order][:-1]])
+    stops = np.r_[starts[1:], len(order)] - 1
+    return finite[np.unique(np.concatenate([order[starts], order[stops]]))]
+
+
+def _downloadSpectrumFile(spectrum_file_name, star_name):
+    """Download a Calspec FITS file or pull it from the cache if available,
+    and return its file name in the astropy cache folder."""
+    url = CALSPEC_ARCHIVE + spectrum_file_name
+    try:
+        output_file_name = download_file(url, cache=True)
+    except URLError as e:
+        raise RuntimeError(f"Failed to get data for {star_name} from {url}") from e
+    return output_file_name
+
+
+def _readSpectrumTable(output_file_name):
+    with _WARNINGS_LOCK, warnings.catch_warnings():  # calspec fits files use non-astropy units everywhere
+        warnings.filterwarnings("ignore", message=".*did not parse as fits unit")
+        t = fits.getdata(output_file_name)
+    return t
+
+
+def _spectrumTableToNumpy(tab, columns=None, dtype=None):
+    """Make a dictionary of numpy arrays with astropy units from a Calspec
+    FITS table, with the given columns and floating point type."""
+    if columns is not None:
+        missing = set(columns) - set(tab.columns.names)
+        if len(missing) > 0:
+            raise KeyError(f"Columns {sorted(missing)} not in FITS table columns {tab.columns.names}.")
+    d = {}
+    for col in tab.columns:
+        if columns is not None and col.name not in columns:
+            continue
+        data = tab[col.name]
+        if dtype is not None and np.issubdtype(data.dtype, np.floating):
+            data = data.astype(dtype)
+        else:
+            data = np.copy(data)
+        if col.unit in _FITS_UNITS:
+            data = u.Quantity(data, _FITS_UNITS[col.unit], copy=False)
+        d[col.name] = data
+    return d
+
+
+def _loadSpectrumFile(spectrum_file_name, star_name):
+    output_file_name = _downloadSpectrumFile(spectrum_file_name, star_name)
+    return _spectrumTableToNumpy(_readSpectrumTable(output_file_name))
+
+
+def _combineVersions(filenames, dates, spectra, wavelength=None):
+    """Interpolate spectra from get_spectrum_numpy() on a common wavelength
+    grid, and compute the flux ratios between successive spectra. See
+    Calspec.get_all_versions()."""
+    if wavelength is None:
+        wavelength = spectra[-1]["WAVELENGTH"]
+    flux_unit = _FITS_UNITS["FLAM"]
+    grid = wavelength.value
+    versions = {"FILENAME": filenames, "DATE": dates, "WAVELENGTH": wavelength}
+    for key in ["FLUX", "STATERROR", "SYSERROR"]:
+        values = np.full((len(spectra), len(grid)), np.nan)
+        for k, spectrum in enumerate(spectra):
+            if key in spectrum:
+                w = spectrum["WAVELENGTH"].to_value(wavelength.unit)
+                values[k] = np.interp(grid, w, spectrum[key].to_value(flux_unit), left=np.nan, right=np.nan)
+        versions[key] = values * flux_unit
+    flux = versions["FLUX"].value
+    with np.errstate(divide="ignore", invalid="ignore"):
+        versions["RATIO"] = flux[1:] / flux[:-1]
+    return versions
+
+
+def _radec_to_xyz(ra, dec):
+    """Convert right ascension and declination in degrees to unit vectors."""
+    ra = np.radians(ra)
+    dec = np.radians(dec)
+    cos_dec = np.cos(dec)
+    return np.stack([cos_dec * np.cos(ra), cos_dec * np.sin(ra), np.sin(dec)], axis=-1)
+
+
+def _chord_to_separation(xyz1, xyz2):
+    """Angular separation in degrees between unit vectors, computed from the
+    chord length to remain accurate at small separations."""
+    chord = np.linalg.norm(xyz1 - xyz2, axis=-1)
+    return np.degrees(2 * np.arcsin(np.clip(chord / 2, 0, 1)))
+
+
+class CalspecCatalog:
+    """The CalspecCatalog class holds the whole Calspec table together with
+    precomputed indices for bulk queries.
+
+    Star positions are parsed once from the sexagesimal RA and Decl columns
+    and stored as unit vectors, so that positional queries reduce to
+    vectorized dot products. Gaia source ids are kept sorted, so that they
+    can be looked up in bulk with a binary search.
+
+    """
+
+    def __init__(self, df=None):
+        """
+
+        Parameters
+        ----------
+        df: pandas.DataFrame, optional
+            The Calspec table (default: the table from calspec.csv).
+
+        Examples
+        --------
+        >>> cat = CalspecCatalog()
+        >>> len(cat) == len(getCalspecDataFrame())
+        True
+        """
+        if df is None:
+            df = getCalspecDataFrame()
+        if "Aliases" not in df.columns:
+            df = df.assign(Aliases=_getAliases(df))
+        self.df = df
+        # nullable integer columns (source_id) are kept as Python ints, None
+        # if missing
+        self._columns = {
+            col: (
+                df[col].to_numpy(dtype=object, na_value=None)
+                if pd.api.types.is_extension_array_dtype(df[col]) and pd.api.types.is_integer_dtype(df[col])
+                else df[col].to_numpy()
+            )
+            for col in df.columns
+        }
+        # the first row is kept for labels shared by several rows, as in
+        # get_calspec_keys
+        self._alias_rows = {}
+        for row, aliases in enumerate(self._columns["Aliases"]):
+            for alias in aliases.strip("|").split("|"):
+                self._alias_rows.setdefault(alias, row)
+        valid = df["RA"].notna() & df["Decl"].notna()
+        self.ra = np.full(len(df), np.nan)
+        self.dec = np.full(len(df), np.nan)
+        self.ra[valid] = Angle(df.loc[valid, "RA"].values, unit=u.hourangle).degree
+        self.dec[valid] = Angle(df.loc[valid, "Decl"].values, unit=u.deg).degree
+        # the two PM columns are read as PM (RA, including cos(Decl)) and
+        # PM.1 (Decl)
+        self.pmra = np.nan_to_num(df["PM"].to_numpy(dtype=float))
+        self.pmdec = np.nan_to_num(df["PM.1"].to_numpy(dtype=float))
+        self._positional_rows = np.flatnonzero(valid)
+        self._xyz = _radec_to_xyz(self.ra[self._positional_rows], self.dec[self._positional_rows])
+        source_ids = df["source_id"]
+        self._source_id_rows = np.flatnonzero(source_ids.notna())
+        self._source_ids = source_ids.iloc[self._source_id_rows].to_numpy(dtype=np.int64)
+        order = np.argsort(self._source_ids, kind="stable")
+        self._source_ids = self._source_ids[order]
+        self._source_id_rows = self._source_id_rows[order]
+
+    def __len__(self):
+        return len(self.df)
+
+    def __getitem__(self, row):
+        """Return the Calspec object of a row of the table.
+
+        Examples
+        --------
+        >>> cat = CalspecCatalog()
+        >>> print(cat[27])
+        eta1dor
+        """
+        if not -len(self) <= row < len(self):
+            raise IndexError(f"Row {row} out of range for a catalog of {len(self)} stars.")
+        return Calspec._fromRow(self, row % len(self))
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield Calspec._fromRow(self, row)
+
+    def get_positions(self, epoch=None):
+        """Get the star positions, optionally propagated with their proper
+        motions to a given epoch.
+
+        Parameters
+        ----------
+        epoch: float or str or astropy.time.Time, optional
+            The epoch of the positions, as a Julian year if a float is given
+            (default: None, the J2000 catalog positions).
+
+        Returns
+        -------
+        ra: array_like
+            Right ascensions in degrees.
+        dec: array_like
+            Declinations in degrees.
+
+        Examples
+        --------
+        >>> cat = CalspecCatalog()
+        >>> ra, dec = cat.get_positions(epoch=2024.0)
+        >>> ra.shape == (len(cat),)
+        True
+        """
+        if epoch is None:
+            return self.ra, self.dec
+        if isinstance(epoch, (int, float)):
+            epoch = Time(epoch, format="jyear")
+        elif not isinstance(epoch, Time):
+            epoch = Time(epoch)
+        dt = (epoch - CALSPEC_EPOCH).to_value(u.yr)
+        dec = self.dec + self.pmdec * dt / 3.6e6
+        ra = (self.ra + self.pmra * dt / 3.6e6 / np.cos(np.radians(self.dec))) % 360
+        return ra, dec
+
+    def _get_xyz(self, epoch=None):
+        if epoch is None:
+            return self._xyz
+        ra, dec = self.get_positions(epoch=epoch)
+        return _radec_to_xyz(ra[self._positional_rows], dec[self._positional_rows])
+
+    def crossmatch(self, ra, dec, radius, epoch=None, chunk_size=100000):
+        """Find all Calspec stars within a radius of each given pointing.
+
+        Parameters
+        ----------
+        ra: array_like
+            Right ascensions of the pointings, in degrees or as an angle
+            Quantity.
+        dec: array_like
+            Declinations of the pointings, in degrees or as an angle
+            Quantity.
+        radius: float or astropy.units.Quantity
+            Matching radius, in degrees or as an angle Quantity.
+        epoch: float or str or astropy.time.Time, optional
+            Propagate the catalog positions to this epoch with the proper
+            motions before matching (default: None).
+        chunk_size: int
+            Number of pointings matched at once, bounding memory usage
+            (default: 100000).
+
+        Returns
+        -------
+        idx_pointing: array_like
+            Indices of the matched pointings.
+        idx_catalog: array_like
+            Row indices in the Calspec table of the matched stars.
+        separation: astropy.units.Quantity
+            Angular separations of the matched pairs.
+
+        Examples
+        --------
+        >>> cat = CalspecCatalog()
+        >>> idx_pointing, idx_catalog, sep = cat.crossmatch(
+        ...     [91.539, 0.], [-66.04, 0.], 0.1)
+        >>> print(idx_pointing, list(cat.df["Name"].iloc[idx_catalog]))
+        [0] ['eta1dor']
+        """
+        ra = np.atleast_1d(u.Quantity(ra, u.deg).value)
+        dec = np.atleast_1d(u.Quantity(dec, u.deg).value)
+        cos_radius = np.cos(u.Quantity(radius, u.deg).to_value(u.rad))
+        catalog_xyz = self._get_xyz(epoch=epoch)
+        xyz = _radec_to_xyz(ra, dec)
+        idx_pointing = []
+        idx_catalog = []
+        for start in range(0, len(xyz), chunk_size):
+            stop = start + chunk_size
+            dots = xyz[start:stop] @ catalog_xyz.T
+            i, j = np.nonzero(dots >= cos_radius)
+            idx_pointing.append(i + start)
+            idx_catalog.append(j)
+        idx_pointing = np.concatenate(idx_pointing) if idx_pointing else np.array([], dtype=int)
+        idx_catalog = np.concatenate(idx_catalog) if idx_catalog else np.array([], dtype=int)
+        separation = _chord_to_separation(xyz[idx_pointing], catalog_xyz[idx_catalog])
+        return idx_pointing, self._positional_rows[idx_catalog], separation * u.deg
+
+    def lookup_by_gaia(self, source_ids, as_calspec=False):
+        """Find the Calspec stars corresponding to Gaia source ids.
+
+        Parameters
+        ----------
+        source_ids: array_like
+            Gaia DR3 source ids, as integers or as a nullable integer
+            (e.g. Int64) pandas column, whose missing values are not found.
+            Floating point ids are rejected, since float64 cannot hold Gaia
+            ids exactly.
+        as_calspec: bool
+            If True, return Calspec objects instead of row indices
+            (default: False).
+
+        Returns
+        -------
+        rows: array_like or list
+            Row indices in the Calspec table, -1 for source ids that are not
+            Calspec stars. If as_calspec is True, a list of Calspec objects,
+            with None for source ids that are not Calspec stars.
+
+        Examples
+        --------
+        >>> cat = CalspecCatalog()
+        >>> cat.lookup_by_gaia([5284258831636637440, 42])
+        array([27, -1])
+        >>> stars = cat.lookup_by_gaia([5284258831636637440], as_calspec=True)
+        >>> [str(c) for c in stars]
+        ['eta1dor']
+        """
+        dtype = getattr(source_ids, "dtype", None)
+        if pd.api.types.is_extension_array_dtype(dtype):
+            if not pd.api.types.is_integer_dtype(dtype):
+                raise TypeError(f"Gaia source ids must be integers. Got {dtype=}.")
+            valid = np.atleast_1d(~np.asarray(pd.isna(source_ids)))
+            source_ids = np.atleast_1d(source_ids.to_numpy(dtype=np.int64, na_value=0))
+        else:
+            source_ids = np.atleast_1d(np.asarray(source_ids))
+            if source_ids.size == 0:
+                source_ids = source_ids.astype(np.int64)
+            if not np.issubdtype(source_ids.dtype, np.integer):
+                raise TypeError(f"Gaia source ids must be integers. Got dtype={source_ids.dtype}.")
+            source_ids = source_ids.astype(np.int64, copy=False)
+            valid = np.ones(source_ids.shape, dtype=bool)
+        rows = np.full(source_ids.shape, -1)
+        if len(self._source_ids) > 0:
+            pos = np.searchsorted(self._source_ids, source_ids)
+            pos = np.minimum(pos, len(self._source_ids) - 1)
+            found = (self._source_ids[pos] == source_ids) & valid
+            rows[found] = self._source_id_rows[pos[found]]
+        if as_calspec:
+            return [Calspec._fromRow(self, row) if row >= 0 else None for row in rows]
+        return rows
+
+    def cone_search(self, ra, dec, radius, epoch=None):
+        """Find all Calspec stars within a radius of a position.
+
+        Parameters
+        ----------
+        ra: float or astropy.units.Quantity
+            Right ascension of the cone center, in degrees or as an angle
+            Quantity.
+        dec: float or astropy.units.Quantity
+            Declination of the cone center, in degrees or as an angle
+            Quantity.
+        radius: float or astropy.units.Quantity
+            Cone radius, in degrees or as an angle Quantity.
+        epoch: float or str or astropy.time.Time, optional
+            Propagate the catalog positions to this epoch with the proper
+            motions before matching (default: None).
+
+        Returns
+        -------
+        rows: pandas.DataFrame
+            The rows of the Calspec table inside the cone, sorted by
+            increasing separation given in degrees in the "separation" column.
+
+        Examples
+        --------
+        >>> cat = CalspecCatalog()
+        >>> rows = cat.cone_search(91.539, -66.04, 1)
+        >>> print(list(rows["Name"]))
+        ['eta1dor']
+        """
+        _, idx_catalog, separation = self.crossmatch(ra, dec, radius, epoch=epoch)
+        order = np.argsort(separation)
+        rows = self.df.iloc[idx_catalog[order]].copy()
+        rows["separation"] = separation[order].value
+        return rows
+
+
+class SpectrumCache:
+    """The SpectrumCache class loads Calspec spectra lazily with
+    Calspec.get_spectrum_numpy() and keeps the most recently used ones in
+    memory, dropping the least recently used ones to stay within a memory
+    budget.
+
+    The cached arrays are shared by all callers and are therefore read-only.
+    A SpectrumCache can be used by concurrent threads: the cache is locked
+    only to look up, insert or drop spectra, not while loading them.
+
+    """
+
+    def __init__(self, max_bytes=None, columns=None, dtype=None):
+        """
+
+        Parameters
+        ----------
+        max_bytes: int, optional
+            Total size in bytes of the spectra kept in memory (default: None,
+            no limit).
+        columns: list, optional
+            Names of the FITS table columns to load (default: None, all
+            columns).
+        dtype: numpy.dtype, optional
+            Type the floating point columns are converted to (default: None,
+            the FITS column types).
+
+        Examples
+        --------
+        >>> cache = SpectrumCache(max_bytes=2**30,
+        ...                       columns=["WAVELENGTH", "FLUX"],
+        ...                       dtype=np.float32)
+        >>> spectrum = cache.get_spectrum_numpy("eta1 dor")
+        >>> len(cache)
+        1
+        """
+        self.max_bytes = max_bytes
+        self.columns = columns
+        self.dtype = dtype
+        self.nbytes = 0
+        self._spectra = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._spectra)
+
+    def get_spectrum_numpy(self, star, type="stis", date="latest"):
+        """Get a spectrum from the cache, or load it if it is not in memory.
+
+        Parameters
+        ----------
+        star: Calspec or str
+            The Calspec star or its name.
+        type: str
+            Choose between STIS or model spectrum. Must be either 'stis'
+            or 'mod' (default: 'stis').
+        date: str
+            The most recent file before the given date is used
+            (default: 'latest').
+
+        Returns
+        -------
+        table: dict
+            A dictionary with the FITS table columns and their astropy units,
+            as in Calspec.get_spectrum_numpy().
+        """
+        if not isinstance(star, Calspec):
+            star = Calspec(star)
+        # dates which select the same file share its entry
+        key = star.get_spectrum_fits_filename(type=type, date=date)
+        with self._lock:
+            if key in self._spectra:
+                self._spectra.move_to_end(key)
+                return self._spectra[key]
+        spectrum = star.get_spectrum_numpy(type=type, date=date, columns=self.columns, dtype=self.dtype)
+        for value in spectrum.values():
+            value.flags.writeable = False
+        nbytes = sum(value.nbytes for value in spectrum.values())
+        if self.max_bytes is not None and nbytes > self.max_bytes:
+            return spectrum
+        with self._lock:
+            if key in self._spectra:  # loaded meanwhile by another thread
+                self._spectra.move_to_end(key)
+                return self._spectra[key]
+            self._spectra[key] = spectrum
+            self.nbytes += nbytes
+            while self.max_bytes is not None and self.nbytes > self.max_bytes:
+                _, dropped = self._spectra.popitem(last=False)
+                self.nbytes -= sum(value.nbytes for value in dropped.values())
+        return spectrum
+
+    def clear(self):
+        """Drop all the spectra from memory."""
+        with self._lock:
+            self._spectra.clear()
+            self.nbytes = 0
+
+
+class SpectrumInterpolator:
+    """The SpectrumInterpolator class evaluates a Calspec spectrum and its
+    uncertainties at arbitrary wavelengths.
+
+    The spectrum arrays are converted once to sorted contiguous float64
+    arrays, with the slopes between successive points for linear
+    interpolation, so that each evaluation is a binary search and a few
+    vectorized operations. With linear interpolation, STATERROR is
+    propagated as independent errors of the two neighbouring points and
+    SYSERROR as fully correlated errors.
+
+    """
+
+    def __init__(self, spectrum, kind="linear"):
+        """
+
+        Parameters
+        ----------
+        spectrum: dict
+            A dictionary with at least WAVELENGTH and FLUX Quantities, as
+            returned by Calspec.get_spectrum_numpy().
+        kind: str
+            Interpolation method, either 'linear' or 'nearest'
+            (default: 'linear').
+
+        Examples
+        --------
+        >>> spectrum = {"WAVELENGTH": [1, 2, 3] * u.angstrom,
+        ...             "FLUX": [1, 2, 4] * u.W}
+        >>> interpolator = SpectrumInterpolator(spectrum)
+        >>> interpolator([1.5, 2.5, 4])["FLUX"]
+        <Quantity [1.5, 3. , nan] W>
+        """
+        if kind not in ["linear", "nearest"]:
+            raise ValueError(f"Interpolation kind must be either 'linear' or 'nearest'. Got {kind=}.")
+        self.kind = kind
+        wavelength = spectrum["WAVELENGTH"]
+        if len(wavelength) < 2:
+            raise ValueError("At least two points are needed to interpolate a spectrum.")
+        order = np.argsort(wavelength.value, kind="stable")
+        self.wavelength_unit = wavelength.unit
+        self.wavelength = np.ascontiguousarray(wavelength.value[order], dtype=np.float64)
+        self.units = {}
+        self.values = {}
+        for key in ["FLUX", "STATERROR", "SYSERROR"]:
+            if key in spectrum:
+                self.units[key] = spectrum[key].unit
+                self.values[key] = np.ascontiguousarray(spectrum[key].value[order], dtype=np.float64)
+        self._dw = np.diff(self.wavelength)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self._slopes = {key: np.diff(value) / self._dw for key, value in self.values.items()}
+
+    def __call__(self, wavelengths):
+        """Evaluate the spectrum at the given wavelengths, see
+        Calspec.flux_at()."""
+        w = u.Quantity(wavelengths, self.wavelength_unit).to_value(self.wavelength_unit)
+        w = np.asarray(w, dtype=np.float64)
+        # index of the left point of the interval containing each wavelength
+        i = np.searchsorted(self.wavelength, w, side="right") - 1
+        i = np.clip(i, 0, len(self.wavelength) - 2)
+        dx = w - self.wavelength[i]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = dx / self._dw[i]
+        outside = ~((w >= self.wavelength[0]) & (w <= self.wavelength[-1]))
+        result = {}
+        for key, value in self.values.items():
+            if self.kind == "nearest":
+                out = value[i + (t > 0.5)]
+            elif key == "STATERROR":
+                out = np.hypot((1 - t) * value[i], t * value[i + 1])
+            else:
+                out = value[i] + self._slopes[key][i] * dx
+            # np.where also keeps the shape of scalar wavelengths
+            out = np.where(outside, np.nan, out)
+            result[key] = u.Quantity(out, self.units[key], copy=False)
+        return result
 
 
 if __name__ == "__main__":
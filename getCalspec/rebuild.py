@@ -12,11 +12,13 @@ import urllib.request
 
 
 from getCalspec import _getPackageDir, getCalspecDataFrame, Calspec, CALSPEC_ARCHIVE
+from getCalspec.getCalspec import _getDataFilename, _readCsvTable, _writeBinaryTable, _clearTableCache
 
 __all__ = [
     "rebuild_tables",
     "rebuild_cache",
     "update_history_table",
+    "write_binary_tables",
     "download_all_data",
 ]
 
@@ -175,6 +177,7 @@ def rebuild_tables(gaia_data_release="DR3"):
     csvFilename = os.path.abspath(csvFilename)
     df.to_csv(csvFilename)
     logger.warning(f"Successfully wrote new .csv file to {csvFilename}")
+    write_binary_tables(names=["calspec"])
 
 
 def update_history_table(force=False):
@@ -234,6 +237,29 @@ def update_history_table(force=False):
         tmp_df.set_index("Filename", inplace=True)
         df = pd.concat([df, tmp_df])
     df.to_csv(csvFilename)
+    write_binary_tables(names=["history"])
+
+
+def write_binary_tables(names=("calspec", "history")):
+    """Write the Parquet form of the csv tables, with normalized column
+    types, parsed dates and the sanitized star aliases, which is loaded at
+    runtime instead of parsing the csv files.
+
+    Examples
+    --------
+    >>> write_binary_tables()
+    """
+    logger = logging.getLogger()
+    for name in names:
+        df = _readCsvTable(name)
+        filename = _getDataFilename(name, ".parquet")
+        try:
+            _writeBinaryTable(df, name)
+        except ImportError:
+            logger.warning(f"pyarrow is not installed, {filename} is not written.")
+            continue
+        logger.warning(f"Successfully wrote new .parquet file to {filename}")
+    _clearTableCache()
 
 
 def _getFileListFromURL(url, ext=".fits"):
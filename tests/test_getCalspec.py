@@ -1,8 +1,42 @@
 import unittest
-from getCalspec import is_calspec, Calspec
+from getCalspec import is_calspec, Calspec, CalspecCatalog, getCalspecCatalog, SpectrumCache
+from getCalspec import SpectrumInterpolator
+from getCalspec import export_spectra_dataset, get_catalog_versions, map_spectra, plot_spectra
+from getCalspec.getCalspec import _readBinaryTable, _readCsvTable, _combineVersions, _clearTableCache
+from getCalspec.getCalspec import _decimateMinMax, _writeBinaryTable
+from concurrent.futures import ThreadPoolExecutor
 from astropy.io.fits import FITS_rec
+from astropy.coordinates import SkyCoord
+import astropy.units as u
 import astropy
+import copy
+import getCalspec.batch
+import getCalspec.getCalspec
+import importlib.util
+import matplotlib.pyplot as plt
+import multiprocessing
+import numpy as np
+import pandas as pd
+import pickle
 import os
+import shutil
+import tempfile
+import threading
+import warnings
+from unittest import mock
+
+
+def _get_bright_flux(spectrum):
+    """Used by map_spectra in the tests, which needs a picklable function."""
+    bright = spectrum["FLUX"] > np.median(spectrum["FLUX"])
+    n = int(bright.sum())
+    return {"WAVELENGTH": spectrum["WAVELENGTH"][bright], "FLUX": spectrum["FLUX"][bright], "N": n}
+
+
+def _get_masked_flux(spectrum):
+    """Used by map_spectra in the tests, returns an ndarray subclass."""
+    flux = spectrum["FLUX"].value
+    return np.ma.masked_less(flux, np.median(flux))
 
 
 class GetCalspecTestCase(unittest.TestCase):
@@ -25,6 +59,406 @@ class GetCalspecTestCase(unittest.TestCase):
         for key in expectedKeys:
             self.assertIn(key, data.keys())
 
+    def test_CalspecCatalog_crossmatch(self):
+        cat = CalspecCatalog()
+        rng = np.random.default_rng(42)
+        ra = rng.uniform(0, 360, 20000)
+        dec = np.degrees(np.arcsin(rng.uniform(-1, 1, 20000)))
+        idx_pointing, idx_catalog, sep = cat.crossmatch(ra, dec, 2 * u.deg, chunk_size=3000)
+        # compare with a brute force astropy matching
+        valid = np.isfinite(cat.ra)
+        pointings = SkyCoord(ra * u.deg, dec * u.deg)
+        stars = SkyCoord(cat.ra[valid] * u.deg, cat.dec[valid] * u.deg)
+        expected = set()
+        for k, star in zip(np.flatnonzero(valid), stars):
+            expected.update((i, k) for i in np.flatnonzero(pointings.separation(star) < 2 * u.deg))
+        self.assertEqual(set(zip(idx_pointing, idx_catalog)), expected)
+        self.assertTrue(np.all(sep < 2 * u.deg))
+
+    def test_CalspecCatalog_cone_search(self):
+        cat = CalspecCatalog()
+        rows = cat.cone_search(91.539, -66.04, 1)
+        self.assertEqual(list(rows["Name"]), ["eta1dor"])
+        # proper motion moves stars between the reference epoch and today
+        ra, dec = cat.get_positions(epoch=2024.0)
+        k = rows.index[0]
+        self.assertGreater(abs(dec[k] - cat.dec[k]), 0)
+        rows = cat.cone_search(ra[k] * u.deg, dec[k] * u.deg, 0.1 * u.arcsec, epoch=2024.0)
+        self.assertEqual(list(rows["Name"]), ["eta1dor"])
+
+    def test_CalspecCatalog_lookup_by_gaia(self):
+        cat = CalspecCatalog()
+        known = cat.df["source_id"].dropna()
+        queries = np.concatenate([known.to_numpy(dtype=np.int64), [0, 1, 2**62]])
+        rows = cat.lookup_by_gaia(queries)
+        n = len(known)
+        np.testing.assert_array_equal(rows[:n], known.index)
+        np.testing.assert_array_equal(rows[n:], -1)
+        stars = cat.lookup_by_gaia([5284258831636637440, 1], as_calspec=True)
+        self.assertEqual(str(stars[0]), "eta1dor")
+        self.assertIsNone(stars[1])
+        # float ids are not exact and are rejected, nullable integers are
+        # accepted
+        with self.assertRaises(TypeError):
+            cat.lookup_by_gaia(np.array([5284258831636637440.0]))
+        with self.assertRaises(TypeError):
+            cat.lookup_by_gaia(pd.Series([5284258831636637440.0, np.nan]))
+        ids = pd.Series([5284258831636637440, None, 0], dtype="Int64")
+        np.testing.assert_array_equal(cat.lookup_by_gaia(ids), [27, -1, -1])
+        np.testing.assert_array_equal(cat.lookup_by_gaia(ids.array), [27, -1, -1])
+        self.assertEqual(len(cat.lookup_by_gaia([])), 0)
+
+    @unittest.skipIf(importlib.util.find_spec("pyarrow") is None, "pyarrow is not installed")
+    def test_binary_tables(self):
+        for name in ["calspec", "history"]:
+            df = _readBinaryTable(name)
+            self.assertIsNotNone(df, f"{name}.parquet is missing or out of date with {name}.csv")
+            pd.testing.assert_frame_equal(df, _readCsvTable(name))
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(df["Date"]))
+
+    @unittest.skipIf(importlib.util.find_spec("pyarrow") is None, "pyarrow is not installed")
+    def test_binary_tables_fallback(self):
+        data_filename = getCalspec.getCalspec._getDataFilename
+        with tempfile.TemporaryDirectory() as dirname:
+            with mock.patch.object(
+                getCalspec.getCalspec,
+                "_getDataFilename",
+                lambda name, ext: os.path.join(dirname, name + ext),
+            ):
+                shutil.copy(data_filename("history", ".csv"), dirname)
+                # missing Parquet file
+                self.assertIsNone(_readBinaryTable("history"))
+                _writeBinaryTable(_readCsvTable("history"), "history")
+                self.assertIsNotNone(_readBinaryTable("history"))
+                # Parquet file written from another csv file
+                with open(os.path.join(dirname, "history.csv"), "a") as f:
+                    f.write("\n")
+                self.assertIsNone(_readBinaryTable("history"))
+                # corrupt Parquet file
+                with open(os.path.join(dirname, "history.parquet"), "wb") as f:
+                    f.write(b"not a parquet file")
+                self.assertIsNone(_readBinaryTable("history"))
+                _clearTableCache()
+                try:
+                    df = getCalspec.getCalspec._loadTable("history")
+                finally:
+                    _clearTableCache()
+                pd.testing.assert_frame_equal(df, _readCsvTable("history"))
+
+    def test_Calspec_record(self):
+        c = Calspec("eta dor")
+        self.assertFalse(hasattr(c, "__dict__"))
+        self.assertIs(c._catalog, getCalspecCatalog())
+        self.assertEqual(c.Name, "eta1dor")
+        self.assertEqual(c.source_id, 5284258831636637440)
+        self.assertAlmostEqual(c.dec, -66.0396, places=4)
+        self.assertEqual(c.pmdec, 27.82)
+        self.assertEqual(list(c.query["Name"]), ["eta1dor"])
+        with self.assertRaises(AttributeError):
+            c.NotAColumn
+        # every row of the catalog is a Calspec view on that row
+        cat = getCalspecCatalog()
+        names = [star.Name for star in cat]
+        self.assertEqual(names, list(cat.df["Name"]))
+        self.assertEqual(cat[-1].Name, names[-1])
+        # pickled and copied objects share the catalog instead of a copy of it
+        self.assertLess(len(pickle.dumps(c)), 1000)
+        for other in [pickle.loads(pickle.dumps(c)), copy.deepcopy(c), copy.copy(c)]:
+            self.assertIs(other._catalog, cat)
+            self.assertEqual(other.Name, "eta1dor")
+            self.assertEqual(other.label, c.label)
+        custom = CalspecCatalog(cat.df.iloc[::-1].reset_index(drop=True))
+        other = pickle.loads(pickle.dumps(custom[0]))
+        self.assertEqual(other.Name, custom[0].Name)
+
+    @unittest.skipIf(importlib.util.find_spec("pyarrow") is None, "pyarrow is not installed")
+    @astropy.config.set_temp_cache(os.path.join(os.path.abspath(os.path.dirname(__file__)), "data", "cache"))
+    def test_arrow(self):
+        import pyarrow.dataset as ds
+
+        c = Calspec("eta dor")
+        data = c.get_spectrum_numpy(date="2024-01-01")
+        table = c.to_arrow(date="2024-01-01")
+        np.testing.assert_array_equal(table["flux"].to_numpy(), data["FLUX"].value)
+        self.assertEqual(table.schema.field("flux").metadata[b"unit"], data["FLUX"].unit.to_string().encode())
+
+        with tempfile.TemporaryDirectory() as path:
+            export_spectra_dataset(path, stars=[c], types=["stis"], date="2024-01-01")
+            # exporting again replaces the previous files
+            export_spectra_dataset(path, stars=[c], types=["stis"], date="2024-01-01")
+            dataset = ds.dataset(path, format="parquet", partitioning="hive")
+            self.assertEqual(len(dataset.files), 1)
+            t = dataset.to_table(filter=(ds.field("star") == "eta1dor") & (ds.field("wavelength") < 3000))
+            self.assertEqual(t.num_rows, np.sum(data["WAVELENGTH"].value < 3000))
+            self.assertEqual(set(t["version"].to_numpy()), {4})
+            self.assertEqual(set(t["type"].to_pylist()), {"stis"})
+
+    @astropy.config.set_temp_cache(os.path.join(os.path.abspath(os.path.dirname(__file__)), "data", "cache"))
+    def test_versions(self):
+        c = Calspec("eta dor")
+        rows = c.get_version_dataframe(type="stis")
+        self.assertEqual(list(rows["Extension"]), [f"_stis_00{k}" for k in range(1, 6)])
+        self.assertTrue(rows["Date"].is_monotonic_increasing)
+        # combine a spectrum with a recalibrated and truncated copy of itself
+        old = c.get_spectrum_numpy(date="2024-01-01")
+        new = {key: value.copy() for key, value in old.items()}
+        new["FLUX"] *= 1.1
+        cut = old["WAVELENGTH"] > 2000 * u.angstrom
+        for key in new:
+            new[key] = new[key][cut]
+        versions = _combineVersions(["old.fits", "new.fits"], rows["Date"].to_numpy()[:2], [old, new])
+        self.assertIs(versions["WAVELENGTH"], new["WAVELENGTH"])
+        self.assertEqual(versions["FLUX"].shape, (2, np.sum(cut)))
+        np.testing.assert_allclose(versions["RATIO"][0], 1.1, rtol=1e-6)
+        dates = rows["Date"].to_numpy()[:2]
+        versions = _combineVersions(["old.fits", "new.fits"], dates, [old, new], wavelength=old["WAVELENGTH"])
+        self.assertTrue(np.all(np.isnan(versions["RATIO"][0, ~cut])))
+        self.assertEqual(versions["FLUX"].unit, old["FLUX"].unit)
+
+        # a star with a file which cannot be downloaded is skipped
+        def load(filename, star_name):
+            if star_name == "eta1dor" and filename.endswith("_003.fits"):
+                raise RuntimeError(f"Failed to get data for {star_name}")
+            return old
+
+        with mock.patch.object(getCalspec.batch, "_loadSpectrumFile", load):
+            with self.assertLogs(level="WARNING") as logs:
+                versions = get_catalog_versions(stars=["eta dor", "mu col", "eta dor"], max_workers=1)
+        self.assertEqual(list(versions), ["mucol"])
+        self.assertEqual(len(versions["mucol"]["FILENAME"]), len(Calspec("mu col").get_version_dataframe()))
+        self.assertEqual(len(logs.output), 2)
+
+    @unittest.skipIf("fork" not in multiprocessing.get_all_start_methods(), "workers need the test cache")
+    @astropy.config.set_temp_cache(os.path.join(os.path.abspath(os.path.dirname(__file__)), "data", "cache"))
+    def test_map_spectra(self):
+        expected = _get_bright_flux(Calspec("eta dor").get_spectrum_numpy(date="2024-01-01"))
+        shm_before = set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+        # sun has no stis spectrum and is skipped
+        results = map_spectra(
+            _get_bright_flux,
+            stars=["eta dor", "sun", "eta dor"],
+            date="2024-01-01",
+            workers=2,
+            max_pending=1,
+            mp_context=multiprocessing.get_context("fork"),
+        )
+        results = list(results)
+        self.assertEqual([str(star) for star, _ in results], ["eta1dor", "eta1dor"])
+        for _, result in results:
+            self.assertEqual(result["N"], expected["N"])
+            self.assertTrue(np.all(result["FLUX"] == expected["FLUX"]))
+            self.assertEqual(result["WAVELENGTH"].unit, expected["WAVELENGTH"].unit)
+        if os.path.isdir("/dev/shm"):
+            self.assertEqual(set(os.listdir("/dev/shm")), shm_before)
+        # ndarray subclasses are pickled with their attributes
+        expected = _get_masked_flux(Calspec("eta dor").get_spectrum_numpy(date="2024-01-01"))
+        results = map_spectra(
+            _get_masked_flux,
+            stars=["eta dor"],
+            date="2024-01-01",
+            workers=1,
+            mp_context=multiprocessing.get_context("fork"),
+        )
+        for _, result in results:
+            self.assertIsInstance(result, np.ma.MaskedArray)
+            np.testing.assert_array_equal(result.mask, expected.mask)
+        # rows of other catalogs do not match the catalog of the workers
+        custom = CalspecCatalog(getCalspecCatalog().df.iloc[::-1].reset_index(drop=True))
+        with self.assertRaises(ValueError):
+            next(map_spectra(_get_bright_flux, stars=[custom[0]], workers=1))
+
+    @astropy.config.set_temp_cache(os.path.join(os.path.abspath(os.path.dirname(__file__)), "data", "cache"))
+    def test_spectrum_memory(self):
+        c = Calspec("eta dor")
+        full = c.get_spectrum_numpy(date="2024-01-01")
+        data = c.get_spectrum_numpy(date="2024-01-01", columns=["WAVELENGTH", "FLUX"], dtype=np.float32)
+        self.assertEqual(list(data.keys()), ["WAVELENGTH", "FLUX"])
+        self.assertEqual(data["WAVELENGTH"].dtype, np.float32)
+        self.assertEqual(data["FLUX"].unit, full["FLUX"].unit)
+        np.testing.assert_allclose(data["WAVELENGTH"].value, full["WAVELENGTH"].value, rtol=1e-6)
+        with self.assertRaises(KeyError):
+            c.get_spectrum_numpy(date="2024-01-01", columns=["NOTACOLUMN"])
+
+        nbytes = sum(value.nbytes for value in data.values())
+        cache = SpectrumCache(max_bytes=2 * nbytes, columns=["WAVELENGTH", "FLUX"], dtype=np.float32)
+        first = cache.get_spectrum_numpy(c, date="2024-01-01")
+        self.assertIs(cache.get_spectrum_numpy("eta dor", date="2024-01-01"), first)
+        self.assertFalse(first["FLUX"].flags.writeable)
+        # other dates which select the same file share its entry
+        filename = c.get_spectrum_fits_filename(date="2024-01-01")
+        self.assertEqual(c.get_spectrum_fits_filename(date="2024-02-01"), filename)
+        self.assertIs(cache.get_spectrum_numpy(c, date="2024-02-01"), first)
+        self.assertEqual((len(cache), cache.nbytes), (1, nbytes))
+        # other files fill the cache and drop the least recently used one,
+        # with the content of the only file of the test cache
+        load = Calspec.get_spectrum_numpy
+
+        def load_other(star, type="stis", date="latest", columns=None, dtype=None):
+            return load(c, date="2024-01-01", columns=columns, dtype=dtype)
+
+        with mock.patch.object(Calspec, "get_spectrum_numpy", load_other):
+            cache.get_spectrum_numpy("mu col")
+            cache.get_spectrum_numpy(c, date="2024-01-01")
+            cache.get_spectrum_numpy("hd 93521")
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.nbytes, 2 * nbytes)
+        self.assertIs(cache.get_spectrum_numpy(c, date="2024-01-01"), first)
+        self.assertEqual(set(cache._spectra), {filename, Calspec("hd 93521").get_spectrum_fits_filename()})
+        cache.clear()
+        self.assertEqual((len(cache), cache.nbytes), (0, 0))
+
+    def test_threads_catalog(self):
+        names = list(getCalspecCatalog().df["Star_name"])
+        expected_names = [Calspec(name).Name for name in names]
+        dates = ["2021-03-20", "2022-01-01", "latest"]
+        expected = {}
+        for name in names[:20]:
+            c = Calspec(name)
+            for date in dates:
+                try:
+                    expected[name, date] = c.get_spectrum_fits_filename(type="stis", date=date)
+                except ValueError:
+                    pass
+        nthreads = 16
+        barrier = threading.Barrier(nthreads)
+
+        def work(k):
+            barrier.wait()
+            results = [(getCalspecCatalog(), [Calspec(name).Name for name in names])]
+            for (name, date), filename in expected.items():
+                results.append(Calspec(name).get_spectrum_fits_filename(type="stis", date=date) == filename)
+            return results
+
+        # all threads load the tables and the catalog at once
+        _clearTableCache()
+        with ThreadPoolExecutor(nthreads) as executor:
+            results = list(executor.map(work, range(nthreads)))
+        catalog = getCalspecCatalog()
+        for (thread_catalog, thread_names), *checks in results:
+            self.assertIs(thread_catalog, catalog)
+            self.assertEqual(thread_names, expected_names)
+            self.assertTrue(all(checks))
+
+    @astropy.config.set_temp_cache(os.path.join(os.path.abspath(os.path.dirname(__file__)), "data", "cache"))
+    def test_threads_spectra(self):
+        c = Calspec("eta dor")
+        expected = c.get_spectrum_numpy(date="2024-01-01", columns=["FLUX"])["FLUX"]
+        nbytes = expected.nbytes
+        cache = SpectrumCache(max_bytes=3 * nbytes, columns=["FLUX"])
+        dates = [f"2024-01-{day:02d}" for day in range(1, 7)]
+        filters = list(warnings.filters)
+        nthreads = 8
+        barrier = threading.Barrier(nthreads)
+
+        def work(k):
+            barrier.wait()
+            ok = True
+            for i in range(20):
+                date = dates[(k * 5 + i) % len(dates)]
+                ok &= bool(np.all(cache.get_spectrum_numpy(c, date=date)["FLUX"] == expected))
+                if i % 5 == 0:
+                    ok &= bool(np.all(c.get_spectrum_numpy(date=date)["FLUX"] == expected))
+            return ok
+
+        with ThreadPoolExecutor(nthreads) as executor:
+            self.assertTrue(all(executor.map(work, range(nthreads))))
+        # all the dates select the same file
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.nbytes, nbytes)
+        # cached hits at any date do not scan the history table with pandas
+        c.flux_at(5000, date="2024-01-01")
+        cached = cache.get_spectrum_numpy(c, date=dates[0])
+
+        def hit(k):
+            ok = True
+            for date in dates:
+                ok &= cache.get_spectrum_numpy(c, date=date) is cached
+                ok &= bool(c.flux_at(5000, date=date)["FLUX"] > 0)
+            return ok
+
+        with mock.patch.object(Calspec, "get_file_dataframe", side_effect=AssertionError):
+            with mock.patch.object(pd, "to_datetime", side_effect=AssertionError):
+                with ThreadPoolExecutor(nthreads) as executor:
+                    self.assertTrue(all(executor.map(hit, range(nthreads))))
+        self.assertEqual(warnings.filters, filters)
+
+    def test_decimate(self):
+        rng = np.random.default_rng(0)
+        x = np.sort(rng.uniform(1000, 10000, 100000))
+        y = np.sin(x / 10) + rng.normal(0, 0.1, len(x))
+        for log in [False, True]:
+            index = _decimateMinMax(x, y, 500, log=log)
+            self.assertLessEqual(len(index), 1000)
+            self.assertTrue(np.all(np.diff(index) > 0))
+            self.assertEqual(y[index].max(), y.max())
+            self.assertEqual(y[index].min(), y.min())
+        np.testing.assert_array_equal(_decimateMinMax(x[:100], y[:100], 500), np.arange(100))
+
+    @astropy.config.set_temp_cache(os.path.join(os.path.abspath(os.path.dirname(__file__)), "data", "cache"))
+    def test_plot(self):
+        c = Calspec("eta dor")
+        fig = c.plot_spectrum(date="2024-01-01", show=False)
+        npixels = fig.axes[0].get_window_extent().width
+        self.assertLessEqual(len(fig.axes[0].lines[0].get_xdata()), 2 * np.ceil(npixels))
+        plt.close(fig)
+        fig = plot_spectra([c, "eta1 dor"], dates=["2024-01-01", "2024-02-01"], show=False)
+        self.assertEqual(len(fig.axes), 1)
+        self.assertEqual(len(fig.axes[0].get_legend().get_texts()), 4)
+        plt.close(fig)
+        # the sun has no stis spectrum and is skipped
+        with self.assertLogs(level="WARNING"):
+            fig = plot_spectra(["sun", c], dates=["2024-01-01"])
+        self.assertEqual(len(fig.axes[0].get_legend().get_texts()), 1)
+        plt.close(fig)
+        # the figure is closed when a star is not found
+        with self.assertRaises(KeyError):
+            plot_spectra([c, "NotACalspecStar"], dates=["2024-01-01"])
+        self.assertEqual(plt.get_fignums(), [])
+
+    @astropy.config.set_temp_cache(os.path.join(os.path.abspath(os.path.dirname(__file__)), "data", "cache"))
+    def test_flux_at(self):
+        c = Calspec("eta dor")
+        data = c.get_spectrum_numpy(date="2024-01-01")
+        w = data["WAVELENGTH"].value
+        interpolator = c.get_interpolator(date="2024-01-01")
+        self.assertIs(c.get_interpolator(date="2024-02-01"), interpolator)
+        self.assertIs(Calspec("eta1 dor").get_interpolator(date="2024-01-01"), interpolator)
+
+        rng = np.random.default_rng(0)
+        queries = rng.uniform(w[0] - 100, w[-1] + 100, 100000)
+        f = c.flux_at(queries, date="2024-01-01")
+        expected = np.interp(queries, w, data["FLUX"].value, left=np.nan, right=np.nan)
+        np.testing.assert_allclose(f["FLUX"].value, expected, rtol=1e-6)
+        self.assertEqual(f["FLUX"].unit, data["FLUX"].unit)
+        # halfway between two points
+        mid = 0.5 * (w[100:110] + w[101:111])
+        f = c.flux_at(mid * u.angstrom, date="2024-01-01")
+        stat = data["STATERROR"].value
+        expected = 0.5 * np.hypot(stat[100:110], stat[101:111])
+        np.testing.assert_allclose(f["STATERROR"].value, expected, rtol=1e-6)
+        syst = data["SYSERROR"].value
+        np.testing.assert_allclose(f["SYSERROR"].value, 0.5 * (syst[100:110] + syst[101:111]), rtol=1e-6)
+        # nearest points
+        f = c.flux_at((w[100:110] + 0.1 * np.diff(w)[100:110]) / 10 * u.nm, date="2024-01-01", kind="nearest")
+        np.testing.assert_array_equal(f["FLUX"].value, data["FLUX"].value[100:110])
+
+        spectrum = {"WAVELENGTH": [1, 2, 3] * u.angstrom, "FLUX": [1, 2, 4] * u.W}
+        f = SpectrumInterpolator(spectrum)([0.5, 1, 2.5, 3, 4])
+        np.testing.assert_array_equal(f["FLUX"].value, [np.nan, 1, 3, 4, np.nan])
+        # scalar and multidimensional wavelengths keep their shape
+        interpolator = SpectrumInterpolator(spectrum)
+        self.assertEqual(interpolator(2.5)["FLUX"], 3 * u.W)
+        self.assertTrue(interpolator(4 * u.angstrom)["FLUX"].isscalar)
+        self.assertTrue(np.isnan(interpolator(4 * u.angstrom)["FLUX"]))
+        self.assertEqual(SpectrumInterpolator(spectrum, kind="nearest")(1.2)["FLUX"], 1 * u.W)
+        self.assertEqual(interpolator([[1, 2], [2.5, 4]])["FLUX"].shape, (2, 2))
+        scalar = c.flux_at(5000, date="2024-01-01")
+        self.assertTrue(scalar["FLUX"].isscalar)
+        self.assertEqual(scalar["FLUX"], c.flux_at([5000], date="2024-01-01")["FLUX"][0])
+        self.assertEqual(list(f.keys()), ["FLUX"])
+        with self.assertRaises(ValueError):
+            SpectrumInterpolator(spectrum, kind="cubic")
+
 
 if __name__ == "__main__":
     unittest.main()